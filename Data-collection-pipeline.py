@@ -6,9 +6,13 @@ import json
 import time
 import re
 import unicodedata
+import hashlib
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor,
+                                as_completed, wait, FIRST_COMPLETED)
 import pandas as pd
 
 # LLM imports
@@ -26,37 +30,164 @@ except ImportError:
     HAS_PYMUPDF = False
     print("WARNING: PyMuPDF not installed - PDF renaming disabled")
 
+# orjson for faster JSON I/O (falls back to stdlib json)
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Precompiled patterns (reused per file / per page)
+_DOI_BODY = r"10\.\d{4,9}/[-._;()/:A-Z0-9]+"
+_DOI_RE = re.compile(rf"\b({_DOI_BODY})", re.I)
+_DOI_LABEL_RE = re.compile(rf"(?:doi|DOI)[\s:]*\s*({_DOI_BODY})", re.I)
+_DOI_URL_RE = re.compile(rf"(?:dx\.doi\.org|doi\.org)/\s*({_DOI_BODY})", re.I)
+# Free-text scan ends on a word boundary (drops trailing '-', '/', etc.)
+_DOI_TEXT_RE = re.compile(rf"\b({_DOI_BODY})\b", re.I)
+_DOI_PREFIX_RE = re.compile(r"^10\.\d{4,9}")
+# Max total PDF bytes kept in memory between the rename and extraction phases
+_PDF_BYTES_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# DOIs sit in the page header/footer; only scan this many chars from each end
+_DOI_SCAN_CHARS = 2048
+_WS_RE = re.compile(r"\s+")
+# Fenced code blocks in an LLM response; a json-tagged block wins over any other.
+# The closing fence is optional (truncated replies often omit it).
+_JSON_FENCE_RE = re.compile(r"```json\s*(.*?)(?:```|\Z)", re.S)
+_FENCE_RE = re.compile(r"```\s*(.*?)(?:```|\Z)", re.S)
+_FN_TRANS = str.maketrans("", "", r'<>:"/\|?*')
+# Title-line exclusions; cheap str checks gate the regexes in _title_from_text
+_DOI_MENTION_RE = re.compile(r"doi[\s:]", re.I)
+_PUBLISHED_RE = re.compile(r"published|received|accepted", re.I)
+_VOLUME_RE = re.compile(r"volume|issue|page", re.I)
+_ALL_CAPS_RE = re.compile(r"[A-Z\s]{3,}")  # case-sensitive on purpose
+
 #renaiming pdfs
 def clean_filename(text: str, max_len: int = 100) -> str:
     """Clean text for Windows-safe filename"""
     text = unicodedata.normalize("NFKD", text)
     text = text.encode("ascii", "ignore").decode("ascii")
-    invalid_chars = r'<>:"/\|?*'
-    for char in invalid_chars:
-        text = text.replace(char, "")
-    text = re.sub(r"\s+", " ", text).strip()
+    text = text.translate(_FN_TRANS)
+    text = _WS_RE.sub(" ", text).strip()
     text = text.strip(". ")
     if len(text) > max_len:
         text = text[:max_len].rsplit(" ", 1)[0]
     return text or "Untitled"
 
 
+def _doi_from_metadata(meta: Dict) -> Optional[str]:
+    """Extract DOI from a document metadata dict"""
+    try:
+        for key in ["subject", "keywords", "doi", "DOI"]:
+            value = meta.get(key, "")
+            if value:
+                doi_match = _DOI_RE.search(value)
+                if doi_match:
+                    return doi_match.group(1).rstrip(" .,;")
+    except Exception:
+        pass
+    return None
+
+
+def _text_head(text: str, n: int) -> str:
+    """First ~n chars of text, extended to the end of the line so no DOI is cut"""
+    end = text.find("\n", n)
+    return text if end == -1 else text[:end]
+
+
+def _text_tail(text: str, n: int) -> str:
+    """Last ~n chars of text, extended back to the start of the line"""
+    if len(text) <= n:
+        return text
+    start = text.rfind("\n", 0, len(text) - n)
+    return text if start == -1 else text[start + 1:]
+
+
+def _find_doi(text: str) -> Optional[str]:
+    for pattern in (_DOI_LABEL_RE, _DOI_URL_RE, _DOI_TEXT_RE):
+        match = pattern.search(text)
+        if match:
+            doi = match.group(1).rstrip(" .,;)")
+            if "/" in doi and len(doi) > 7:
+                return doi
+    return None
+
+
+def _doi_from_text(doc, first_page_text: Optional[str] = None) -> Optional[str]:
+    """Extract DOI from the header/footer text of the first page(s) of an open document"""
+    try:
+        if len(doc) == 0:
+            return None
+        text = first_page_text if first_page_text is not None else doc[0].get_text("text")
+        if len(text) <= 2 * _DOI_SCAN_CHARS:
+            doi = _find_doi(text)
+        else:
+            doi = _find_doi(_text_head(text, _DOI_SCAN_CHARS) + "\n"
+                            + _text_tail(text, _DOI_SCAN_CHARS))
+        if doi:
+            return doi
+        
+        # Page 1 is only extracted when page 0 has no DOI
+        if len(doc) > 1:
+            return _find_doi(_text_head(doc[1].get_text("text"), _DOI_SCAN_CHARS))
+    except Exception:
+        pass
+    return None
+
+
+def _title_from_metadata(meta: Dict) -> Optional[str]:
+    """Extract title from a document metadata dict"""
+    try:
+        title = (meta.get("title") or "").strip()
+        if title and len(title) > 10:
+            return title
+    except Exception:
+        pass
+    return None
+
+
+def _title_from_text(doc, first_page_text: Optional[str] = None) -> str:
+    """Extract title from the first page of an open document using heuristics"""
+    try:
+        if len(doc) == 0:
+            return "Untitled"
+        text = first_page_text if first_page_text is not None else doc[0].get_text("text")
+        lines = [l.strip() for l in text.splitlines() if l.strip()]
+        if not lines:
+            return "Untitled"
+        
+        for line in lines[:10]:
+            if not 15 <= len(line) <= 200:
+                continue
+            if line.isdecimal():
+                continue
+            if line.isupper() and _ALL_CAPS_RE.fullmatch(line):
+                continue
+            low = line.lower()
+            if "doi" in low and _DOI_MENTION_RE.search(line):
+                continue
+            if "copyright" in low or "©" in line or "(c)" in low:
+                continue
+            if _PUBLISHED_RE.search(line) or _VOLUME_RE.search(line):
+                continue
+            return line
+        
+        for line in lines[:5]:
+            if len(line) > 10:
+                return line
+    except Exception:
+        pass
+    return "Untitled"
+
+
 def extract_doi_from_metadata(pdf_path: Path) -> Optional[str]:
     """Extract DOI from PDF metadata"""
     if not HAS_PYMUPDF:
         return None
     try:
         with fitz.open(pdf_path) as doc:
-            metadata = doc.metadata or {}
-            for key in ["subject", "keywords", "doi", "DOI"]:
-                value = metadata.get(key, "")
-                if value:
-                    doi_match = re.search(r"\b(10\.\d{4,9}/[-._;()/:A-Z0-9]+)", value, re.I)
-                    if doi_match:
-                        return doi_match.group(1).rstrip(" .,;")
+            return _doi_from_metadata(doc.metadata or {})
     except Exception:
-        pass
-    return None
+        return None
 
 
 def extract_doi_from_text(pdf_path: Path) -> Optional[str]:
@@ -65,23 +196,9 @@ def extract_doi_from_text(pdf_path: Path) -> Optional[str]:
         return None
     try:
         with fitz.open(pdf_path) as doc:
-            pages_to_check = min(3, len(doc))
-            for page_num in range(pages_to_check):
-                text = doc[page_num].get_text()
-                patterns = [
-                    r"(?:doi|DOI)[\s:]*\s*(10\.\d{4,9}/[-._;()/:A-Z0-9]+)",
-                    r"(?:dx\.doi\.org|doi\.org)/\s*(10\.\d{4,9}/[-._;()/:A-Z0-9]+)",
-                    r"\b(10\.\d{4,9}/[-._;()/:A-Z0-9]+)\b",
-                ]
-                for pattern in patterns:
-                    match = re.search(pattern, text, re.I)
-                    if match:
-                        doi = match.group(1).rstrip(" .,;)")
-                        if "/" in doi and len(doi) > 7:
-                            return doi
+            return _doi_from_text(doc)
     except Exception:
-        pass
-    return None
+        return None
 
 
 def extract_title_from_metadata(pdf_path: Path) -> Optional[str]:
@@ -90,12 +207,9 @@ def extract_title_from_metadata(pdf_path: Path) -> Optional[str]:
         return None
     try:
         with fitz.open(pdf_path) as doc:
-            title = doc.metadata.get("title", "").strip()
-            if title and len(title) > 10:
-                return title
+            return _title_from_metadata(doc.metadata or {})
     except Exception:
-        pass
-    return None
+        return None
 
 
 def extract_title_from_text(pdf_path: Path) -> str:
@@ -104,40 +218,108 @@ def extract_title_from_text(pdf_path: Path) -> str:
         return "Untitled"
     try:
         with fitz.open(pdf_path) as doc:
-            if len(doc) == 0:
-                return "Untitled"
-            text = doc[0].get_text()
-            lines = [l.strip() for l in text.splitlines() if l.strip()]
-            if not lines:
-                return "Untitled"
-            
-            exclude_patterns = [
-                r"(?i)doi[\s:]",
-                r"(?i)published|received|accepted",
-                r"(?i)volume|issue|page",
-                r"(?i)copyright|©|\(c\)",
-                r"^\d+$",
-                r"^[A-Z\s]{3,}$",
-            ]
-            
-            for line in lines[:10]:
-                if 15 <= len(line) <= 200:
-                    if not any(re.search(pat, line) for pat in exclude_patterns):
-                        return line
+            return _title_from_text(doc)
+    except Exception:
+        return "Untitled"
+
+
+def extract_doi_and_title(pdf_path: Path, data: Optional[bytes] = None) -> Tuple[Optional[str], str]:
+    """Extract DOI and title from PDF (opens the file once, from data if given)"""
+    if not HAS_PYMUPDF:
+        return None, "Untitled"
+    try:
+        doc = fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(pdf_path)
+        with doc:
+            # doc.metadata rebuilds the dict on every access; read it once
+            meta = doc.metadata or {}
+            doi = _doi_from_metadata(meta)
+            title = _title_from_metadata(meta)
+            if doi and title:
+                return doi, title
             
-            for line in lines[:5]:
-                if len(line) > 10:
-                    return line
+            # Share one page-0 text extraction between the DOI and title scans
+            try:
+                first_page_text = doc[0].get_text("text") if len(doc) else ""
+            except Exception:
+                first_page_text = None
+            doi = doi or _doi_from_text(doc, first_page_text)
+            title = title or _title_from_text(doc, first_page_text)
+            return doi, title
     except Exception:
-        pass
-    return "Untitled"
+        return None, "Untitled"
+
+
+def _extract_rename_info(pdf_path: Path, keep_bytes: bool = False
+                         ) -> Optional[Tuple[Path, Optional[str], str, Optional[bytes]]]:
+    """Worker for the rename pool: return (pdf_path, doi, title, data) or None on error"""
+    try:
+        data = pdf_path.read_bytes()
+        doi, title = extract_doi_and_title(pdf_path, data)
+        return pdf_path, doi, title, data if keep_bytes else None
+    except Exception:
+        return None
+
+
+def _jdumps(obj) -> str:
+    """Serialize to a compact JSON string"""
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits from LLM output
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def _jbytes(obj, pretty: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits from LLM output
+    return json.dumps(obj, indent=2 if pretty else None, ensure_ascii=False).encode("utf-8")
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Write via temp file + os.replace so a crash never leaves a truncated file"""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _jload(path: Path):
+    """Read a JSON file"""
+    if HAS_ORJSON:
+        return orjson.loads(path.read_bytes())
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _append_jsonl(path: Path, record: dict):
+    """Append one JSON record as a line (compact, no indent)"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(_jdumps(record) + "\n")
+
+
+def _read_jsonl(path: Path):
+    """Yield records from a JSON-Lines file, skipping a torn trailing line"""
+    if not path.exists():
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield orjson.loads(line) if HAS_ORJSON else json.loads(line)
+            except ValueError:
+                continue
 
 
-def extract_doi_and_title(pdf_path: Path) -> Tuple[Optional[str], str]:
-    """Extract DOI and title from PDF"""
-    doi = extract_doi_from_metadata(pdf_path) or extract_doi_from_text(pdf_path)
-    title = extract_title_from_metadata(pdf_path) or extract_title_from_text(pdf_path)
-    return doi, title
+def _list_pdfs(directory: Path) -> List[Path]:
+    """Sorted .pdf files directly inside directory (single scandir pass)"""
+    with os.scandir(directory) as entries:
+        return sorted(Path(e.path) for e in entries
+                      if e.name.lower().endswith(".pdf") and e.is_file())
 
 
 def get_unique_path(path: Path) -> Path:
@@ -169,7 +351,9 @@ class PDFDataExtractionPipeline:
                  model_name: str = None,
                  prompt_file: str = None,
                  rename_pdfs: bool = True,
-                 debug_mode: bool = False):
+                 debug_mode: bool = False,
+                 use_cache: bool = True,
+                 max_workers: int = 4):
                  
         self.workspace_dir = Path(__file__).parent.absolute()
         self.provider = provider.lower()
@@ -187,9 +371,12 @@ class PDFDataExtractionPipeline:
         self.output_dir = self.target_dir / "output"
         self.processed_dir = self.target_dir / "processed_pdfs"
         self.checkpoint_file = self.target_dir / "pipeline_checkpoint.json"
+        self.checkpoint_events = self.checkpoint_file.with_suffix(".jsonl")
+        self.response_cache_dir = self.target_dir / ".llm_cache"
         
         # 2. Setup Logs & Configs
         self.renamed_log = self.target_dir / "renamed_files.json"
+        self.renamed_events = self.renamed_log.with_suffix(".jsonl")
         if prompt_file:
             self.prompt_file = Path(prompt_file)
         else:
@@ -197,10 +384,22 @@ class PDFDataExtractionPipeline:
         
         self.rename_pdfs = rename_pdfs
         self.debug_mode = debug_mode
+        self.use_cache = use_cache
+        self.max_workers = max(1, max_workers)
+        self._checkpoint_lock = threading.Lock()
+        # Spaces out API calls across worker threads (cache hits skip it)
+        self._rate_limit_lock = threading.Lock()
+        self._last_api_call = 0.0
+        
+        # DOI/title found during renaming, keyed by (new) PDF filename
+        self._pdf_meta_cache: Dict[str, Dict] = {}
+        # Raw bytes read during renaming, consumed once by the response-cache hash
+        self._pdf_bytes_cache: Dict[str, bytes] = {}
         
         # 3. Create necessary subfolders
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.processed_dir.mkdir(parents=True, exist_ok=True)
+        self.response_cache_dir.mkdir(parents=True, exist_ok=True)
         
         print("-" * 60)
         print(f"PDF EXTRACTION PIPELINE")
@@ -215,6 +414,11 @@ class PDFDataExtractionPipeline:
         
         # Load prompt
         self.extraction_prompt = self._load_prompt()
+        # Hashed once; only the PDF bytes are hashed per file for the response cache
+        self._prompt_hash = hashlib.blake2b(
+            f"{self.provider}:{self.model_name}:{self.extraction_prompt}".encode(),
+            digest_size=8
+        ).hexdigest()
         
         # Initialize Backend
         if self.provider == "gemini":
@@ -253,49 +457,88 @@ class PDFDataExtractionPipeline:
         return prompt
     
     def _load_checkpoint(self) -> Dict:
+        checkpoint = {'processed': [], 'failed': [], 'stats': {}}
         if self.checkpoint_file.exists():
-            with open(self.checkpoint_file, 'r') as f:
-                return json.load(f)
-        return {'processed': [], 'failed': [], 'stats': {}}
+            checkpoint = _jload(self.checkpoint_file)
+        self._processed_set = set(checkpoint.get('processed', []))
+        
+        # Replay events appended since the last full save
+        for event in _read_jsonl(self.checkpoint_events):
+            if event.get('type') == 'processed':
+                pdf_name = event['pdf']
+                if pdf_name not in self._processed_set:
+                    self._processed_set.add(pdf_name)
+                    checkpoint['processed'].append(pdf_name)
+                checkpoint['stats'][pdf_name] = {
+                    'num_records': event['num_records'],
+                    'processed_at': event['processed_at']
+                }
+            elif event.get('type') == 'failed':
+                checkpoint['failed'].append({
+                    'pdf': event['pdf'],
+                    'error': event['error'],
+                    'failed_at': event['failed_at']
+                })
+        return checkpoint
     
     def _save_checkpoint(self):
-        with open(self.checkpoint_file, 'w') as f:
-            json.dump(self.checkpoint, f, indent=2)
+        """Write the full checkpoint and clear the event log it now covers"""
+        _write_atomic(self.checkpoint_file, _jbytes(self.checkpoint, pretty=True))
+        self.checkpoint_events.unlink(missing_ok=True)
     
     def _is_processed(self, pdf_name: str) -> bool:
-        return pdf_name in self.checkpoint['processed']
+        return pdf_name in self._processed_set
     
     def _mark_processed(self, pdf_name: str, num_records: int):
-        if pdf_name not in self.checkpoint['processed']:
+        if pdf_name not in self._processed_set:
+            self._processed_set.add(pdf_name)
             self.checkpoint['processed'].append(pdf_name)
         
-        self.checkpoint['stats'][pdf_name] = {
-            'num_records': num_records,
-            'processed_at': datetime.now().isoformat()
-        }
-        self._save_checkpoint()
+        processed_at = datetime.now().isoformat()
+        with self._checkpoint_lock:
+            self.checkpoint['stats'][pdf_name] = {
+                'num_records': num_records,
+                'processed_at': processed_at
+            }
+            _append_jsonl(self.checkpoint_events, {
+                'type': 'processed',
+                'pdf': pdf_name,
+                'num_records': num_records,
+                'processed_at': processed_at
+            })
     
     def _mark_failed(self, pdf_name: str, error: str):
-        self.checkpoint['failed'].append({
+        entry = {
             'pdf': pdf_name,
             'error': str(error),
             'failed_at': datetime.now().isoformat()
-        })
-        self._save_checkpoint()
+        }
+        # Called from worker threads in process_pdf
+        with self._checkpoint_lock:
+            self.checkpoint['failed'].append(entry)
+            _append_jsonl(self.checkpoint_events, {'type': 'failed', **entry})
     
     def _load_rename_log(self) -> dict:
+        log = {}
         if self.renamed_log.exists():
             try:
-                with open(self.renamed_log, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                log = _jload(self.renamed_log)
             except Exception:
-                return {}
-        return {}
+                log = {}
+        for event in _read_jsonl(self.renamed_events):
+            log[event.pop('new_name')] = event
+        return log
+    
+    def _append_rename_log(self, new_name: str, entry: dict):
+        try:
+            _append_jsonl(self.renamed_events, {'new_name': new_name, **entry})
+        except Exception as e:
+            print(f"Warning: Could not append to rename log: {e}")
     
     def _save_rename_log(self, log: dict):
         try:
-            with open(self.renamed_log, 'w', encoding='utf-8') as f:
-                json.dump(log, f, indent=2, ensure_ascii=False)
+            _write_atomic(self.renamed_log, _jbytes(log, pretty=True))
+            self.renamed_events.unlink(missing_ok=True)
         except Exception as e:
             print(f"Warning: Could not save rename log: {e}")
     
@@ -307,7 +550,7 @@ class PDFDataExtractionPipeline:
             print("PyMuPDF not installed - skipping PDF renaming")
             return 0
         
-        pdf_files = list(self.input_dir.glob("*.pdf"))
+        pdf_files = _list_pdfs(self.input_dir)
         if not pdf_files:
             return 0
         
@@ -316,16 +559,45 @@ class PDFDataExtractionPipeline:
         rename_log = self._load_rename_log()
         renamed_count = 0
         
-        for idx, pdf_path in enumerate(pdf_files, 1):
+        # Files renamed on earlier runs already have their DOI/title logged
+        for name, entry in rename_log.items():
+            self._pdf_meta_cache[name] = {"doi": entry.get("doi"), "title": entry.get("title")}
+        
+        # Skip if already standardized (DOI format)
+        to_rename = [p for p in pdf_files if not _DOI_PREFIX_RE.match(p.name)]
+        
+        # Keep PDF bytes for the response-cache hash, up to a total size budget
+        keep_flags = []
+        budget = _PDF_BYTES_CACHE_MAX_BYTES
+        for p in to_rename:
+            try:
+                size = p.stat().st_size
+            except OSError:
+                size = budget + 1
+            keep_flags.append(size <= budget)
+            if size <= budget:
+                budget -= size
+        
+        # PyMuPDF is not thread-safe, so extraction runs in worker processes;
+        # renames stay serial in this process
+        max_workers = min(8, os.cpu_count() or 1, len(to_rename))
+        if max_workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=max_workers) as ex:
+                    results = list(ex.map(_extract_rename_info, to_rename, keep_flags, chunksize=4))
+            except Exception as e:
+                print(f"Warning: PDF renaming failed: {e}")
+                return 0
+        else:
+            results = [_extract_rename_info(p, k) for p, k in zip(to_rename, keep_flags)]
+        
+        for result in results:
+            if result is None:
+                continue
+            pdf_path, doi, title, data = result
             original_name = pdf_path.name
             
-            # Skip if already standardized (DOI format)
-            if re.match(r"^10\.\d{4,9}", original_name):
-                continue
-                
             try:
-                doi, title = extract_doi_and_title(pdf_path)
-                
                 if doi:
                     doi_clean = clean_filename(doi, max_len=50)
                     title_clean = clean_filename(title, max_len=100)
@@ -343,13 +615,18 @@ class PDFDataExtractionPipeline:
                     "title": title,
                     "renamed_at": datetime.now().isoformat()
                 }
+                self._append_rename_log(new_path.name, rename_log[new_path.name])
+                self._pdf_meta_cache[new_path.name] = {"doi": doi, "title": title}
+                if data is not None:
+                    self._pdf_bytes_cache[new_path.name] = data
                 renamed_count += 1
                 
             except Exception:
                 pass
         
-        if renamed_count > 0:
+        if renamed_count > 0 or self.renamed_events.exists():
             self._save_rename_log(rename_log)
+        if renamed_count > 0:
             print(f"Renamed {renamed_count} files.")
             
         return renamed_count
@@ -357,19 +634,21 @@ class PDFDataExtractionPipeline:
     def _process_with_gemini(self, pdf_path: Path) -> Optional[str]:
         """Internal handler for Gemini API"""
         # Upload
-        print(f"  > Uploading...")
+        print(f"  > Uploading {pdf_path.name}...")
         uploaded_file = genai.upload_file(path=str(pdf_path))
         
-        # Wait
+        # Wait (exponential backoff, 0.5s up to 4s)
+        delay = 0.5
         while uploaded_file.state.name == "PROCESSING":
-            time.sleep(1)
+            time.sleep(delay)
+            delay = min(delay * 2, 4)
             uploaded_file = genai.get_file(uploaded_file.name)
         
         if uploaded_file.state.name == "FAILED":
             raise Exception("Gemini processing failed state")
             
         # Generate
-        print(f"  > Extracting...")
+        print(f"  > Extracting {pdf_path.name}...")
         response = self.model.generate_content(
             [self.extraction_prompt, uploaded_file],
             request_options={"timeout": 300}
@@ -380,6 +659,36 @@ class PDFDataExtractionPipeline:
         
         return response.text
 
+    def _wait_for_rate_limit(self, interval: float = 1.0):
+        """Rate limit buffer: keep API calls at least `interval` seconds apart"""
+        with self._rate_limit_lock:
+            remaining = self._last_api_call + interval - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            self._last_api_call = time.monotonic()
+    
+    def _response_cache_path(self, pdf_path: Path) -> Path:
+        """Cache file keyed by PDF content hash + prompt/model hash"""
+        data = self._pdf_bytes_cache.pop(pdf_path.name, None)
+        if data is None:
+            data = pdf_path.read_bytes()
+        pdf_hash = hashlib.blake2b(data).hexdigest()
+        return self.response_cache_dir / f"{pdf_hash}_{self._prompt_hash}.json"
+    
+    def _load_cached_response(self, cache_path: Path) -> Optional[str]:
+        if not self.use_cache or not cache_path.exists():
+            return None
+        try:
+            return _jload(cache_path).get('response_text')
+        except Exception:
+            return None
+    
+    def _save_cached_response(self, cache_path: Path, response_text: str):
+        try:
+            _write_atomic(cache_path, _jbytes({'response_text': response_text}))
+        except Exception as e:
+            print(f"  Warning: Could not cache response: {e}")
+    
     def process_pdf(self, pdf_path: Path) -> Optional[List[Dict]]:
         print(f"Processing: {pdf_path.name}")
         
@@ -387,14 +696,22 @@ class PDFDataExtractionPipeline:
             return None
         
         try:
-            # Delegate to provider handler
-            if self.provider == "gemini":
-                response_text = self._process_with_gemini(pdf_path)
-            else:
-                raise NotImplementedError("Provider not supported")
+            cache_path = self._response_cache_path(pdf_path)
+            response_text = self._load_cached_response(cache_path)
+            from_cache = bool(response_text)
             
-            if not response_text:
-                raise Exception("Empty response from API")
+            if from_cache:
+                print(f"  > Using cached response")
+            else:
+                self._wait_for_rate_limit()
+                # Delegate to provider handler
+                if self.provider == "gemini":
+                    response_text = self._process_with_gemini(pdf_path)
+                else:
+                    raise NotImplementedError("Provider not supported")
+                
+                if not response_text:
+                    raise Exception("Empty response from API")
 
             # Save debug
             if self.debug_mode:
@@ -404,11 +721,11 @@ class PDFDataExtractionPipeline:
             
             # Extract JSON
             cleaned_text = response_text.strip()
-            if "```json" in cleaned_text:
-                cleaned_text = cleaned_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in cleaned_text:
-                cleaned_text = cleaned_text.split("```")[1].split("```")[0].strip()
+            fence = _JSON_FENCE_RE.search(cleaned_text) or _FENCE_RE.search(cleaned_text)
+            if fence:
+                cleaned_text = fence.group(1).strip()
             
+            # stdlib json: LLM output may contain NaN/Infinity, which orjson rejects
             materials = json.loads(cleaned_text)
             
             if not isinstance(materials, list):
@@ -416,16 +733,19 @@ class PDFDataExtractionPipeline:
                 if not materials:
                      raise ValueError("Output is not a valid JSON list")
             
-            # Add metadata
-            for item in materials:
-                metadata = {
-                    'source_pdf': pdf_path.name,
-                    'extracted_at': datetime.now().isoformat()
-                }
-                # Prepend metadata
-                item_with_meta = {**metadata, **item}
-                item.clear()
-                item.update(item_with_meta)
+            # Prepend metadata (one timestamp per PDF)
+            pdf_meta = self._pdf_meta_cache.get(pdf_path.name, {})
+            metadata = {
+                'source_pdf': pdf_path.name,
+                'doi': pdf_meta.get('doi'),
+                'title': pdf_meta.get('title'),
+                'extracted_at': datetime.now().isoformat()
+            }
+            materials = [{**metadata, **item} for item in materials]
+            
+            # Only cache responses that parsed cleanly, so bad replies get retried
+            if not from_cache:
+                self._save_cached_response(cache_path, response_text)
             
             return materials
         
@@ -434,6 +754,28 @@ class PDFDataExtractionPipeline:
             self._mark_failed(pdf_path.name, str(e))
             return None
     
+    def _save_result(self, pdf_path: Path, data: Optional[List[Dict]], combined_fp) -> int:
+        """Write one PDF's records, mark it processed and move it; returns record count"""
+        if not data:
+            return 0
+        for record in data:
+            combined_fp.write(_jdumps(record) + "\n")
+        combined_fp.flush()
+        
+        # Save individual
+        out_file = self.output_dir / f"{pdf_path.stem}.json"
+        _write_atomic(out_file, _jbytes(data, pretty=True))
+        
+        # Mark done
+        self._mark_processed(pdf_path.name, len(data))
+        
+        # Move original
+        try:
+            pdf_path.rename(self.processed_dir / pdf_path.name)
+        except Exception:
+            pass
+        return len(data)
+    
     def run(self, max_papers: Optional[int] = None):
         """Run the pipeline"""
         if self.rename_pdfs:
@@ -443,7 +785,7 @@ class PDFDataExtractionPipeline:
             print(f"Input directory not found: {self.input_dir}")
             return
         
-        all_pdfs = sorted(list(self.input_dir.glob("*.pdf")))
+        all_pdfs = _list_pdfs(self.input_dir)
         to_process = [p for p in all_pdfs if not self._is_processed(p.name)]
         already_processed = [p for p in all_pdfs if self._is_processed(p.name)]
         
@@ -465,38 +807,49 @@ class PDFDataExtractionPipeline:
             to_process = to_process[:max_papers]
             print(f"Limiting to first {max_papers} files.")
         
-        all_data = []
+        # Drop rename-time bytes for PDFs that will not be processed this run
+        queued = {p.name for p in to_process}
+        self._pdf_bytes_cache = {name: data for name, data in self._pdf_bytes_cache.items()
+                                 if name in queued}
         
-        for pdf_path in to_process:
-            data = self.process_pdf(pdf_path)
-            if data:
-                all_data.extend(data)
-                
-                # Save individual
-                out_file = self.output_dir / f"{pdf_path.stem}.json"
-                with open(out_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2)
-                
-                # Mark done
-                self._mark_processed(pdf_path.name, len(data))
-                
-                # Move original
-                try:
-                    pdf_path.rename(self.processed_dir / pdf_path.name)
-                except Exception:
-                    pass
-            
-            time.sleep(1) # Rate limit buffer
+        combined_file = self.output_dir / "combined_data.jsonl"
+        num_new_records = 0
         
-        # Save Combined
-        if all_data:
-            print("Saving combined results...")
-            with open(self.output_dir / "combined_data.json", 'w', encoding='utf-8') as f:
-                json.dump(all_data, f, indent=2)
-            
+        try:
+            # Records are streamed to the combined JSONL as each PDF completes
+            with open(combined_file, 'a', encoding='utf-8') as combined_fp, \
+                    ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+                # Sliding window: up to max_workers PDFs in flight, results handled
+                # serially on this thread as each one completes
+                in_flight = {}
+                for pdf_path in to_process:
+                    while len(in_flight) >= self.max_workers:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            num_new_records += self._save_result(
+                                in_flight.pop(future), future.result(), combined_fp)
+                    in_flight[ex.submit(self.process_pdf, pdf_path)] = pdf_path
+                
+                for future in as_completed(in_flight):
+                    num_new_records += self._save_result(
+                        in_flight[future], future.result(), combined_fp)
+        finally:
+            # Materialize the checkpoint once; per-file events went to the JSONL log
+            self._save_checkpoint()
+        
+        # Export Combined
+        if num_new_records:
+            print(f"Combined results saved to: {combined_file}")
             try:
-                df = pd.DataFrame(all_data)
-                df.to_excel(self.output_dir / "dataset.xlsx", index=False)
+                df = pd.read_json(combined_file, lines=True, dtype=False, convert_dates=False)
+                # A PDF re-run after a crash appends its rows again; keep only its
+                # latest extraction (all rows of one run share extracted_at)
+                if {"source_pdf", "extracted_at"} <= set(df.columns):
+                    latest = df.groupby("source_pdf", dropna=False)["extracted_at"].transform("max")
+                    df = df[df["extracted_at"] == latest]
+                # constant_memory is not used: pandas writes cells column by column,
+                # which xlsxwriter's row-streaming mode would silently drop
+                df.to_excel(self.output_dir / "dataset.xlsx", index=False, engine="xlsxwriter")
                 print(f"Database saved to: {self.output_dir}/dataset.xlsx")
             except Exception as e:
                 print(f"Excel export failed: {e}")
@@ -510,8 +863,10 @@ def main():
     parser.add_argument('--provider', type=str, default='gemini', help='LLM Provider (default: gemini)')
     parser.add_argument('--prompt', type=str, help='Custom prompt file')
     parser.add_argument('--max', type=int, help='Max files to process')
+    parser.add_argument('--workers', type=int, default=4, help='PDFs sent to the API concurrently (default: 4)')
     parser.add_argument('--debug', action='store_true', help='Debug mode')
     parser.add_argument('--no-rename', action='store_true', help='Skip file renaming')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore cached LLM responses (fresh responses are still cached)')
     
     args = parser.parse_args()
     
@@ -552,7 +907,9 @@ def main():
         provider=args.provider,
         prompt_file=args.prompt,
         rename_pdfs=not args.no_rename,
-        debug_mode=args.debug
+        debug_mode=args.debug,
+        use_cache=not args.no_cache,
+        max_workers=args.workers
     )
     
     pipeline.run(max_papers=args.max)
@@ -11,7 +11,7 @@ import shutil
 from pathlib import Path
 
 # Dependency check
-REQUIRED_PACKAGES = ["google.generativeai", "pandas", "openpyxl", "fitz"]
+REQUIRED_PACKAGES = ["google.generativeai", "pandas", "xlsxwriter", "fitz"]
 MISSING_PACKAGES = []
 
 try:
@@ -25,9 +25,9 @@ except ImportError:
     MISSING_PACKAGES.append("pandas")
 
 try:
-    import openpyxl
+    import xlsxwriter
 except ImportError:
-    MISSING_PACKAGES.append("openpyxl")
+    MISSING_PACKAGES.append("xlsxwriter")
 
 try:
     import fitz  # PyMuPDF
@@ -268,7 +268,8 @@ def main():
     prompt_file = setup_prompt(target_folder)
     
     # 5. Confirm
-    pdf_count = len(list(target_folder.glob("*.pdf")))
+    with os.scandir(target_folder) as entries:
+        pdf_count = sum(1 for e in entries if e.name.lower().endswith(".pdf") and e.is_file())
     print("\n" + "="*60)
     print("READY TO START")
     print("="*60)